@@ -4,7 +4,7 @@ from torchvision.models import resnet50
 
 from homura import optim, lr_scheduler, callbacks, reporters, enable_accimage, get_num_nodes
 from homura.trainers import SupervisedTrainer, DistributedSupervisedTrainer
-from homura.vision.data import imagenet_loaders, prefetcher
+from homura.vision.data import imagenet_loaders
 
 
 def main():
@@ -32,16 +32,11 @@ def main():
         trainer = SupervisedTrainer(model, optimizer, F.cross_entropy, callbacks=rep,
                                     data_parallel=multi_gpus)
     # if distributed, need to setup loaders after DistributedSupervisedTrainer
-    _train_loader, _test_loader = imagenet_loaders(args.root, args.batch_size, distributed=args.distributed,
-                                                   num_train_samples=args.batch_size * 10 if args.debug else None,
-                                                   num_test_samples=args.batch_size * 10 if args.debug else None)
+    train_loader, test_loader = imagenet_loaders(args.root, args.batch_size, distributed=args.distributed,
+                                                 num_train_samples=args.batch_size * 10 if args.debug else None,
+                                                 num_test_samples=args.batch_size * 10 if args.debug else None)
+    # loaders use pinned memory, so the trainer prefetches data on a side stream
     for epoch in r:
-        if args.use_prefetcher:
-            train_loader = prefetcher.DataPrefetcher(_train_loader)
-            test_loader = prefetcher.DataPrefetcher(_test_loader)
-        else:
-            train_loader, test_loader = _train_loader, _test_loader
-        # following apex's training scheme
         trainer.train(train_loader)
         trainer.test(test_loader)
 
@@ -64,7 +59,6 @@ if __name__ == '__main__':
     p.add_str("--init_method", default="env://")
     p.add_str("--backend", default="nccl")
     p.add_true("--enable_amp")
-    p.add_true("--use_prefetcher")
     p.add_true("--debug", help="Use less images and less epochs")
     args, _else = p.parse(return_unknown=True)
 
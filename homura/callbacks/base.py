@@ -3,9 +3,12 @@ from collections import ChainMap
 from collections.abc import Mapping
 from typing import Iterable
 
+import torch
+
 
 class Callback(metaclass=ABCMeta):
-    """ Base class of Callback class
+    """ Base class of Callback class. Tensors given to callbacks are detached but may be on GPU. Use `to_cpu` only
+    when CPU values are needed.
     """
 
     def before_iteration(self, data: Mapping) -> Mapping:
@@ -29,6 +32,12 @@ class Callback(metaclass=ABCMeta):
     def close(self):
         pass
 
+    @staticmethod
+    def to_cpu(tensor):
+        if torch.is_tensor(tensor):
+            return tensor.cpu()
+        return tensor
+
     def __enter__(self):
         return self
 
@@ -1,7 +1,6 @@
 from collections.abc import Mapping
 from typing import Callable, Any
 
-import torch
 from torch import distributed
 
 from homura.liblog import get_logger
@@ -61,15 +60,17 @@ class MetricCallback(Callback):
 
             self._last_iter[key] = metric
 
+            # metrics are accumulated on the device where they are computed and transferred to CPU only after
+            # each epoch to avoid synchronizing with GPU every iteration
             if isinstance(metric, Mapping):
                 # first time
                 if self._metrics_history[key][-1] == 0:
-                    self._metrics_history[key][-1] = {k: self.to_cpu(self.reduce(metric[k])) for k in metric.keys()}
+                    self._metrics_history[key][-1] = {k: self.reduce(metric[k]) for k in metric.keys()}
                 else:
-                    self._metrics_history[key][-1] = {k: v + self.to_cpu(self.reduce(metric[k]))
+                    self._metrics_history[key][-1] = {k: v + self.reduce(metric[k])
                                                       for k, v in self._metrics_history[key][-1].items()}
             else:
-                self._metrics_history[key][-1] += self.to_cpu(self.reduce(metric))
+                self._metrics_history[key][-1] = self._metrics_history[key][-1] + self.reduce(metric)
         return self._last_iter
 
     def before_epoch(self, data: Mapping):
@@ -89,10 +90,10 @@ class MetricCallback(Callback):
         # if once this method is called, self._last_epoch is not None
         if self._last_epoch.get(key) is None:
             if isinstance(self._metrics_history[key][-1], Mapping):
-                self._metrics_history[key][-1] = {k: v / divisor
+                self._metrics_history[key][-1] = {k: self.to_cpu(v) / divisor
                                                   for k, v in self._metrics_history[key][-1].items()}
             else:
-                self._metrics_history[key][-1] /= divisor
+                self._metrics_history[key][-1] = self.to_cpu(self._metrics_history[key][-1]) / divisor
             self._last_epoch[key] = self._metrics_history[key][-1]
         return self._last_epoch
 
@@ -122,12 +123,6 @@ class MetricCallback(Callback):
             return tensor / distributed.get_world_size()
         return tensor
 
-    @staticmethod
-    def to_cpu(tensor):
-        if torch.is_tensor(tensor):
-            return tensor.cpu()
-        return tensor
-
 
 class AccuracyCallback(MetricCallback):
     """ Callback for accuracy
@@ -1,7 +1,7 @@
 # optimizers for homura's trainer
 
 from abc import ABCMeta
-from typing import Iterable
+from typing import Iterable, Optional
 
 import torch
 from torch import optim as torch_optim
@@ -12,6 +12,22 @@ from .utils import _optimizers
 __all__ = ["Optimizer", "Adam", "SGD", "ASGD", "RMSProp", "AdaBound"]
 
 
+def _optional_args(**kwargs) -> dict:
+    # arguments such as `foreach` and `fused` are only passed when specified, since older PyTorch does not accept them
+    return {k: v for k, v in kwargs.items() if v is not None}
+
+
+def _with_foreach_fused_doc(doc: Optional[str],
+                            fused_version: str) -> str:
+    # appends the note on `foreach` and `fused` to the docstring of the original optimizer
+    return (doc or "") + f"""
+    Note on `foreach` and `fused` of homura's wrapper:
+        They are passed to the optimizer only when specified, and reduce the number of kernel launches per step.
+        `foreach=True` requires PyTorch>=1.12 and `fused=True` requires PyTorch>={fused_version}.
+        `fused=True` requires all parameters to be floating point CUDA tensors, and cannot be used with `foreach=True`.
+    """
+
+
 class Optimizer(metaclass=ABCMeta):
 
     def __init__(self, optim_cls, **kwargs):
@@ -29,20 +45,24 @@ class Optimizer(metaclass=ABCMeta):
 
 
 class Adam(Optimizer):
-    def __init__(self, lr=0.001, betas=(0.9, 0.999), eps=1e-08, weight_decay=0, amsgrad=False):
+    def __init__(self, lr=0.001, betas=(0.9, 0.999), eps=1e-08, weight_decay=0, amsgrad=False,
+                 foreach: Optional[bool] = None, fused: Optional[bool] = None):
         super(Adam, self).__init__(torch_optim.Adam,
-                                   lr=lr, betas=betas, eps=eps, weight_decay=weight_decay, amsgrad=amsgrad)
+                                   lr=lr, betas=betas, eps=eps, weight_decay=weight_decay, amsgrad=amsgrad,
+                                   **_optional_args(foreach=foreach, fused=fused))
 
-    __doc__ = torch_optim.Adam.__doc__
+    __doc__ = _with_foreach_fused_doc(torch_optim.Adam.__doc__, fused_version="1.13")
 
 
 class SGD(Optimizer):
-    def __init__(self, lr, momentum=0, dampening=0, weight_decay=0, nesterov=False):
+    def __init__(self, lr, momentum=0, dampening=0, weight_decay=0, nesterov=False,
+                 foreach: Optional[bool] = None, fused: Optional[bool] = None):
         super(SGD, self).__init__(torch_optim.SGD, lr=lr, momentum=momentum, dampening=dampening,
                                   weight_decay=weight_decay,
-                                  nesterov=nesterov)
+                                  nesterov=nesterov,
+                                  **_optional_args(foreach=foreach, fused=fused))
 
-    __doc__ = torch_optim.SGD.__doc__
+    __doc__ = _with_foreach_fused_doc(torch_optim.SGD.__doc__, fused_version="2.3")
 
 
 class RMSProp(Optimizer):
@@ -1,4 +1,5 @@
 from abc import ABCMeta
+from collections import defaultdict
 from logging import Logger
 from typing import Iterable, Mapping, Optional, Union
 
@@ -11,6 +12,19 @@ from .utils.environment import get_global_rank
 from .utils.reporter_backends import TQDMWrapper, TensorBoardWrapper, LoggerWrapper, _num_elements, _WrapperBase
 
 
+def _scalars_to_cpu(results: Mapping) -> dict:
+    # transfer scalar GPU tensors to CPU at once to synchronize only once per device and dtype
+    keys_per_device = defaultdict(list)
+    for k, v in results.items():
+        if torch.is_tensor(v) and v.is_cuda and v.nelement() == 1:
+            keys_per_device[v.device, v.dtype].append(k)
+    results = dict(results)
+    for keys in keys_per_device.values():
+        values = torch.stack([results[k].detach().reshape(()) for k in keys]).cpu().tolist()
+        results.update(zip(keys, values))
+    return results
+
+
 class Reporter(Callback, metaclass=ABCMeta):
 
     def __init__(self, base_wrapper: _WrapperBase,
@@ -93,6 +107,7 @@ class Reporter(Callback, metaclass=ABCMeta):
                 self._report_params(data[MODEL], epoch)
 
     def _report(self, results: Mapping, mode: str, idx: int):
+        results = _scalars_to_cpu(results)
         for k, v in results.items():
             # images are processed by self._report_images
             if k in self.image_keys:
@@ -178,6 +193,7 @@ class TQDMReporter(Reporter):
         return len(self.base_wrapper)
 
     def _report(self, results: Mapping, mode: str, idx: int):
+        results = _scalars_to_cpu(results)
         results = {k: float(v) for k, v in results.items() if not isinstance(v, Mapping) and _num_elements(v) == 1}
         self.base_wrapper.add_scalars(results, None, idx)
 
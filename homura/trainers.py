@@ -1,11 +1,13 @@
+import contextlib
+import inspect
 from abc import ABCMeta, abstractmethod
 from pathlib import Path
 from types import MethodType
 from typing import Callable, Iterable, Dict, Mapping, Tuple, Optional
 
 import torch
-from torch import nn
-from torch.utils.data import DataLoader
+from torch import distributed, nn
+from torch.utils.data import DataLoader, DistributedSampler
 from tqdm import tqdm
 
 from homura.liblog import get_logger
@@ -17,9 +19,31 @@ from .utils.containers import TensorTuple, Map, StepDict
 from .utils.environment import is_distributed, get_global_rank, get_local_rank
 from .utils.miscs import check_path
 from .utils.runner import Runner
+from .utils.prefetcher import DataPrefetcher
 
 __all__ = ["TrainerBase", "Trainer", "SupervisedTrainer", "DistributedSupervisedTrainer"]
 
+# zero_grad(set_to_none=True) is available from PyTorch 1.7
+_SET_TO_NONE_AVAILABLE = "set_to_none" in inspect.signature(torch.optim.Optimizer.zero_grad).parameters
+# number of iterations before capturing a CUDA graph to stabilize cudnn.benchmark and the caching allocator
+_CUDA_GRAPH_WARMUP_STEPS = 3
+
+
+def _compile_model(model: nn.Module,
+                   jit: str) -> nn.Module:
+    if jit == "script":
+        return torch.jit.script(model)
+    elif jit == "compile":
+        if not hasattr(torch, "compile"):
+            raise RuntimeError("torch.compile is not available. Use PyTorch>=2.0")
+        if hasattr(model, "compile"):
+            # compiles in-place to keep keys of state_dict
+            model.compile(mode="reduce-overhead")
+            return model
+        return torch.compile(model, mode="reduce-overhead")
+    else:
+        raise ValueError(f"jit should be 'script' or 'compile' but got {jit}")
+
 
 class TrainerBase(Runner, metaclass=ABCMeta):
     """
@@ -31,10 +55,26 @@ class TrainerBase(Runner, metaclass=ABCMeta):
     :param scheduler: homura.scheduler.LRScheduler or dict like {"generator": StepLR(10)}
     :param update_scheduler_by_epoch: If True, update scheduler every epoch. If False and scheduler is given, scheduler
         is need to be update by user.
+    :param accumulation_steps: Number of iterations over which gradients are accumulated before updating parameters.
+        The effective batch size is `accumulation_steps` times as large as the batch size of data loaders.
+        Accumulation windows do not cross epochs: if the number of iterations per epoch is not divisible by
+        `accumulation_steps`, the last window of each epoch is shorter. For data loaders without `__len__`, the
+        incomplete last window is flushed at the end of the epoch.
     :param device:
     :param verb:
     :param use_cudnn_benchmark:
-    :param use_cuda_nonblocking:
+    :param use_cuda_nonblocking: If True, host-to-device transfer is non-blocking. This is automatically enabled when
+        `DataLoader` is created with `pin_memory=True`, as non-blocking transfer only overlaps with computation when
+        the source tensors are in page-locked memory. Non-blocking transfer is done by `DataPrefetcher` on a side stream.
+    :param use_amp: If True, use automatic mixed precision of `torch.cuda.amp` (PyTorch>=1.6). Note that outputs may be
+        FP16 tensors.
+    :param memory_format: If `torch.channels_last`, model(s) are converted to channels-last (NHWC) format, which
+        accelerates convolutions with Tensor Cores, especially with AMP. Only beneficial for CNNs. 4D inputs are
+        converted in `SupervisedTrainer`. Custom `iteration` should convert inputs by `self._to_memory_format(input)`.
+    :param use_submodel_streams: If True and model is dict, each submodel has its own CUDA stream, which is used via
+        `submodel_context`. Effective only when submodels are small and independent.
+    :param jit: If "script", model(s) are compiled by `torch.jit.script`. If "compile", model(s) are compiled by
+        `torch.compile(mode="reduce-overhead")` (PyTorch>=2.0), which also captures CUDA graphs.
     :param logger:
     :param kwargs:
     """
@@ -45,14 +85,40 @@ class TrainerBase(Runner, metaclass=ABCMeta):
                  callbacks: Optional[Callback or Iterable[Callable]] = None,
                  scheduler: Optional[LRScheduler or Dict[LRScheduler]] = None,
                  update_scheduler_by_epoch: bool = True,
+                 accumulation_steps: int = 1,
                  device: Optional[torch.device or str] = None,
-                 verb=True, use_cudnn_benchmark=True, use_cuda_nonblocking=False, logger=None, **kwargs):
+                 verb=True, use_cudnn_benchmark=True, use_cuda_nonblocking=False, use_amp=False,
+                 memory_format=None, use_submodel_streams=False, jit: Optional[str] = None, logger=None,
+                 **kwargs):
 
+        if accumulation_steps < 1:
+            raise ValueError(f"accumulation_steps should be positive but got {accumulation_steps}")
         if logger is None:
             logger = get_logger(__name__)
         super(TrainerBase, self).__init__(model, callbacks, device, use_cudnn_benchmark, use_cuda_nonblocking, logger,
                                           **kwargs)
 
+        self._memory_format = memory_format
+        if memory_format is not None:
+            self.model.to(memory_format=memory_format)
+
+        # set CUDA streams for submodels
+        self._submodel_streams = None
+        if use_submodel_streams:
+            if self._is_single_model:
+                raise TypeError("use_submodel_streams requires dict model")
+            if GPU in str(self.device):
+                self._submodel_streams = {k: torch.cuda.Stream(device=self.device) for k in self.model.keys()}
+
+        # compile model(s)
+        if jit is not None:
+            if self._is_single_model:
+                self.model = _compile_model(self.model, jit)
+            else:
+                for k in self.model.keys():
+                    self.model[k] = _compile_model(self.model[k], jit)
+            self.logger.debug(f"Model is compiled by {jit}")
+
         # set optimizer(s)
         if optimizer is None:
             self.optimizer = None
@@ -66,9 +132,9 @@ class TrainerBase(Runner, metaclass=ABCMeta):
             self.optimizer = StepDict(torch.optim.Optimizer)
             # self.model is nn.ModuleDict, then self.optimizer is StepDict
             for k, opt in optimizer.items():
-                m = self.model._modules.get(k)
-                if m is None:
+                if k not in self.model:
                     raise KeyError(f"No such key {k} in model!")
+                m = self.model[k]
                 if opt is None:
                     self.optimizer[k] = None
                 elif isinstance(opt, Optimizer):
@@ -87,12 +153,26 @@ class TrainerBase(Runner, metaclass=ABCMeta):
 
         self.loss_f = loss_f
         self._verb = verb
+        self._accumulation_steps = accumulation_steps
+
+        # set automatic mixed precision
+        if use_amp and GPU not in str(self.device):
+            self.logger.warning("AMP is only available on GPU and disabled")
+            use_amp = False
+        if use_amp and not hasattr(torch.cuda, "amp"):
+            raise RuntimeError("torch.cuda.amp is not available. Use PyTorch>=1.6")
+        self._use_amp = use_amp
+        self._scaler = torch.cuda.amp.GradScaler() if use_amp else None
 
         # called via property
         # _step and _epoch are set to -1 because they are incremented before each iteration and epoch!
         self._step = -1
         self._epoch = -1
         self._is_train = True
+        self._callback_context = torch.no_grad()
+        # index of the iteration in the current epoch and the number of iterations per epoch (None if unknown)
+        self._step_in_epoch = -1
+        self._iter_per_epoch = None
 
         _map_base = {MODEL: self.model,
                      OPTIMIZER: self.optimizer,
@@ -122,18 +202,63 @@ class TrainerBase(Runner, metaclass=ABCMeta):
 
             def iteration(self, data: Tuple[torch.Tensor]) -> Mapping[str, torch.Tensor]:
                 input, target = data
-                output = self.model(input)
-                loss = self.loss_f(output, target)
+                with self._autocast():
+                    output = self.model(input)
+                    loss = self.loss_f(output, target)
                 if self.is_train:
                     self.optimizer.zero_grad()
-                    loss.backward()
-                    self.optimizer.step()
+                    self._backward(loss)
+                    self._optimizer_step()
                 return Map(loss=loss, output=output)
 
+        To support `use_amp=True`, use `self._autocast()`, `self._backward(loss)` and `self._optimizer_step()` instead
+        of plain forward, `loss.backward()` and `self.optimizer.step()`.
+
         :param data: data used during a iteration
         :return: loss, output
         """
 
+    def _to_memory_format(self, input: torch.Tensor) -> torch.Tensor:
+        """ Convert a 4D input to the memory format given by `memory_format`
+        """
+
+        if self._memory_format is not None and input.dim() == 4:
+            return input.contiguous(memory_format=self._memory_format)
+        return input
+
+    def _autocast(self):
+        """ Context of automatic mixed precision for forward computation if `use_amp=True`
+        """
+
+        if self._use_amp:
+            return torch.cuda.amp.autocast()
+        return contextlib.nullcontext()
+
+    def _backward(self, loss: torch.Tensor):
+        """ Backward, where loss is scaled if `use_amp=True`
+        """
+
+        if self._scaler is not None:
+            self._scaler.scale(loss).backward()
+        else:
+            loss.backward()
+
+    def _optimizer_step(self):
+        """ Update parameters by optimizer(s), where gradients are unscaled if `use_amp=True`
+        """
+
+        if self._scaler is None:
+            self.optimizer.step()
+            return
+
+        if isinstance(self.optimizer, StepDict):
+            for optimizer in self.optimizer.values():
+                if optimizer is not None:
+                    self._scaler.step(optimizer)
+        else:
+            self._scaler.step(self.optimizer)
+        self._scaler.update()
+
     def override_iteration(self, new_iteration: Callable):
         """ Override iteration method ::
 
@@ -150,6 +275,41 @@ class TrainerBase(Runner, metaclass=ABCMeta):
         setattr(self, "iteration", MethodType(new_iteration, self))
         self.logger.debug("Override iteration")
 
+    def submodel_context(self, name: str):
+        """ Context to run a submodel on its own CUDA stream, so that independent submodels can overlap ::
+
+            def iteration(self, data):
+                input, target = data
+                with self.submodel_context("classifier"):
+                    class_loss = self.loss_f(self.model["classifier"](input), target)
+                with self.submodel_context("autoencoder"):
+                    recon_loss = F.mse_loss(self.model["autoencoder"](input), input)
+                self.synchronize_submodels()
+                loss = class_loss + recon_loss
+                ...
+
+        If `use_submodel_streams` is False or on CPU, this context does nothing.
+
+        :param name: key of the submodel
+        """
+
+        if self._submodel_streams is None:
+            return contextlib.nullcontext()
+        stream = self._submodel_streams[name]
+        # inputs are computed on the current stream
+        stream.wait_stream(torch.cuda.current_stream(self.device))
+        return torch.cuda.stream(stream)
+
+    def synchronize_submodels(self):
+        """ Make the current stream wait for the streams of submodels. Should be called before using results of
+        `submodel_context`.
+        """
+
+        if self._submodel_streams is not None:
+            current_stream = torch.cuda.current_stream(self.device)
+            for stream in self._submodel_streams.values():
+                current_stream.wait_stream(stream)
+
     def register_before_iteration(self, name, data):
         self._iteration_map[name] = data
 
@@ -178,24 +338,32 @@ class TrainerBase(Runner, metaclass=ABCMeta):
         :return:
         """
 
-        self._iteration_map.update({STEP: self.step, MODE: mode})
-        with torch.no_grad():
+        # self._iteration_map is reused in every iteration to avoid allocating a new mapping
+        self._iteration_map[STEP] = self.step
+        self._iteration_map[MODE] = mode
+        with self._callback_context:
             self._callbacks.before_iteration(self._iteration_map)
         results = self.iteration(data)
         # backward compatibility
         if isinstance(results, tuple):
             loss, output = TensorTuple(results)
             results = dict(loss=loss, output=output)
-            self._iteration_map.update(**results)
-        else:
-            self._iteration_map.update(**results)
+        # callbacks do not need computational graphs
+        for k, v in results.items():
+            self._iteration_map[k] = v.detach() if torch.is_tensor(v) else v
         self._iteration_map[DATA] = data
-        with torch.no_grad():
+        with self._callback_context:
             self._callbacks.after_iteration(self._iteration_map)
         # clean up
-        self._iteration_map.pop(DATA)
+        del self._iteration_map[DATA]
         for k in results.keys():
-            self._iteration_map.pop(k)
+            del self._iteration_map[k]
+
+    def _end_loop(self):
+        """ Called after the last iteration of each epoch, before `after_epoch` callbacks
+        """
+
+        pass
 
     def __enter__(self):
         """
@@ -214,22 +382,59 @@ class TrainerBase(Runner, metaclass=ABCMeta):
               data_loader: DataLoader,
               mode: str):
         # handle epoch level training loop
-        self._epoch_map.update({EPOCH: self.epoch,
-                                STEP: self.step,
-                                MODE: mode,
-                                ITER_PER_EPOCH: len(data_loader)})
-        with torch.no_grad():
+        self._epoch_map[EPOCH] = self.epoch
+        self._epoch_map[STEP] = self.step
+        self._epoch_map[MODE] = mode
+        try:
+            iter_per_epoch = len(data_loader)
+        except TypeError:
+            # e.g., DataLoader of IterableDataset
+            iter_per_epoch = None
+        self._epoch_map[ITER_PER_EPOCH] = iter_per_epoch
+        self._iter_per_epoch = iter_per_epoch
+        self._step_in_epoch = -1
+        # callbacks are called without autograd. Though tensors in `self._iteration_map` are detached, callbacks may
+        # compute with models, e.g., to evaluate on other data, so no_grad is kept in training.
+        # As `test` is already in no_grad mode, entering it again is needless.
+        self._callback_context = torch.no_grad() if self.is_train else contextlib.nullcontext()
+        with self._callback_context:
             self._callbacks.before_epoch(self._epoch_map)
 
+        if isinstance(getattr(data_loader, "sampler", None), DistributedSampler):
+            # to shuffle differently in every epoch
+            data_loader.sampler.set_epoch(self.epoch)
+
+        if isinstance(data_loader, DataLoader) and data_loader.num_workers > 0 and \
+                not getattr(data_loader, "persistent_workers", False):
+            self.logger.debug("DataLoader re-creates its workers every epoch. Consider persistent_workers=True")
+
+        non_blocking = self._cuda_nonblocking
+        if GPU in str(self.device) and getattr(data_loader, "pin_memory", False):
+            # pinned memory can be transferred asynchronously
+            non_blocking = True
+        elif self._cuda_nonblocking and isinstance(data_loader, DataLoader):
+            self.logger.debug("use_cuda_nonblocking=True but DataLoader is not created with pin_memory=True")
+
+        # if transfer is non-blocking, the next batch is transferred on a side stream while the current batch is processed
+        prefetch = GPU in str(self.device) and non_blocking
+        if prefetch:
+            data_loader = DataPrefetcher(data_loader, device=self.device)
         data_loader = tqdm(data_loader, ncols=80) if self._verb else data_loader
 
-        for data in data_loader:
-            data = TensorTuple(data).to(self.device, non_blocking=self._cuda_nonblocking)
+        num_iter = 0
+        for num_iter, data in enumerate(data_loader, 1):
+            if not prefetch:
+                data = TensorTuple(data).to(self.device, non_blocking=non_blocking)
             if self.is_train:
                 self._step += 1
+            self._step_in_epoch = num_iter - 1
             self._iteration(data, mode)
 
-        with torch.no_grad():
+        self._end_loop()
+        if iter_per_epoch is None:
+            # the number of iterations is known only after the epoch
+            self._epoch_map[ITER_PER_EPOCH] = num_iter
+        with self._callback_context:
             self._callbacks.after_epoch(self._epoch_map)
         self.logger.debug(f"epoch {self.epoch} finished")
 
@@ -339,29 +544,174 @@ class TrainerBase(Runner, metaclass=ABCMeta):
 
 
 class SupervisedTrainer(TrainerBase):
+    """ Trainer for supervised learning
+
+    :param model:
+    :param optimizer:
+    :param loss_f:
+    :param callbacks:
+    :param scheduler:
+    :param verb:
+    :param use_cudnn_benchmark:
+    :param data_parallel:
+    :param use_cuda_graphs: If True, forward and backward of training iterations are captured as a CUDA graph after
+        warmup and replayed afterwards (PyTorch>=1.10). Shapes of inputs should be constant, e.g., by
+        `DataLoader(..., drop_last=True)`. Not compatible with `accumulation_steps>1`, `use_amp=True`,
+        `data_parallel=True` and `jit="compile"`.
+    :param kwargs:
+    """
+
     def __init__(self, model: nn.Module, optimizer: Optimizer, loss_f: Callable, *,
                  callbacks: Optional[Callback or Iterable[Callable]] = None, scheduler: Optional[LRScheduler] = None,
-                 verb=True, use_cudnn_benchmark=True, data_parallel=False, **kwargs):
+                 verb=True, use_cudnn_benchmark=True, data_parallel=False, use_cuda_graphs=False, **kwargs):
         if isinstance(model, dict):
             raise TypeError(f"{type(self)} does not support dict model")
+        if use_cuda_graphs and (data_parallel or kwargs.get("jit") == "compile"):
+            # DataParallel cannot be captured, and torch.compile(mode="reduce-overhead") captures CUDA graphs by itself
+            raise RuntimeError("use_cuda_graphs is not compatible with data_parallel=True and jit='compile'")
         super(SupervisedTrainer, self).__init__(model, optimizer, loss_f, callbacks=callbacks, scheduler=scheduler,
                                                 verb=verb, use_cudnn_benchmark=use_cudnn_benchmark, **kwargs)
         if data_parallel and not isinstance(self.model, nn.DataParallel):
             self.model = nn.DataParallel(self.model)
             self.model.to(self.device)
+        # setting gradients to None instead of filling them with zeros saves a memory write per step
+        self._set_grad_to_none = _SET_TO_NONE_AVAILABLE
+
+        if use_cuda_graphs:
+            if GPU not in str(self.device) or not hasattr(torch.cuda, "CUDAGraph"):
+                raise RuntimeError("CUDA graphs require GPU and PyTorch>=1.10")
+            if self._accumulation_steps > 1 or self._use_amp:
+                raise RuntimeError("use_cuda_graphs is not compatible with accumulation_steps>1 and use_amp=True")
+        self._use_cuda_graphs = use_cuda_graphs
+        self._cuda_graph = None
+        self._num_cuda_graph_warmup = 0
+        self._static_input = None
+        self._static_target = None
+        self._static_output = None
+        self._static_loss = None
 
     def iteration(self, data: Tuple[torch.Tensor]) -> Mapping[str, torch.Tensor]:
         input, target = data
-        output = self.model(input)
-        loss = self.loss_f(output, target)
-        if self.is_train:
-            self.optimizer.zero_grad()
-            loss.backward()
-            self.optimizer.step()
+        input = self._to_memory_format(input)
+        if not self.is_train:
+            with self._autocast():
+                output = self.model(input)
+                loss = self.loss_f(output, target)
+            return Map(loss=loss, output=output)
+        if self._use_cuda_graphs:
+            # streams for warmup, capture and replay should be on self.device, which may not be the current device
+            with torch.cuda.device(self.device):
+                return self._cuda_graph_iteration(input, target)
+
+        # gradients are accumulated for `accumulation_steps` iterations
+        is_first_accumulation, is_last_accumulation, window_size = self._accumulation_window()
+        if is_first_accumulation:
+            self._zero_grad()
+        # DDP decides whether to all-reduce gradients in forward, so forward should be also in this context
+        with self._gradient_sync(is_last_accumulation):
+            with self._autocast():
+                output = self.model(input)
+                loss = self.loss_f(output, target)
+            self._backward(loss / window_size if window_size > 1 else loss)
+        if is_last_accumulation:
+            self._optimizer_step()
             if self.scheduler is not None and not self.update_scheduler_by_epoch:
                 self.scheduler.step()
         return Map(loss=loss, output=output)
 
+    def _cuda_graph_iteration(self,
+                              input: torch.Tensor,
+                              target: torch.Tensor) -> Mapping[str, torch.Tensor]:
+        if self._cuda_graph is None and self._num_cuda_graph_warmup < _CUDA_GRAPH_WARMUP_STEPS:
+            # warmup should be run on a side stream
+            self._num_cuda_graph_warmup += 1
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                self._zero_grad()
+                output = self.model(input)
+                loss = self.loss_f(output, target)
+                loss.backward()
+                self.optimizer.step()
+            torch.cuda.current_stream().wait_stream(stream)
+        else:
+            if self._cuda_graph is None:
+                self._capture_cuda_graph(input, target)
+            if input.shape != self._static_input.shape or target.shape != self._static_target.shape:
+                raise RuntimeError(f"Shapes of inputs should be constant to use CUDA graphs, but got {input.shape} "
+                                   f"instead of {self._static_input.shape}. Use DataLoader(..., drop_last=True)")
+            self._static_input.copy_(input, non_blocking=True)
+            self._static_target.copy_(target, non_blocking=True)
+            # gradients are overwritten, not accumulated, by each replay
+            self._cuda_graph.replay()
+            self.optimizer.step()
+            # static tensors are overwritten by the next replay
+            output = self._static_output.detach().clone()
+            loss = self._static_loss.detach().clone()
+
+        if self.scheduler is not None and not self.update_scheduler_by_epoch:
+            self.scheduler.step()
+        return Map(loss=loss, output=output)
+
+    def _capture_cuda_graph(self,
+                            input: torch.Tensor,
+                            target: torch.Tensor):
+        self._static_input = input.clone()
+        self._static_target = target.clone()
+        # gradients should be allocated from the private memory pool of the graph
+        self.optimizer.zero_grad(set_to_none=True)
+        self._cuda_graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(self._cuda_graph):
+            self._static_output = self.model(self._static_input)
+            self._static_loss = self.loss_f(self._static_output, self._static_target)
+            self._static_loss.backward()
+        self.logger.debug("Captured a CUDA graph")
+
+    def _zero_grad(self):
+        if self._set_grad_to_none:
+            self.optimizer.zero_grad(set_to_none=True)
+        else:
+            self.optimizer.zero_grad()
+
+    def _end_loop(self):
+        # flush the incomplete last window of accumulation, which occurs only if the length of data loader is unknown
+        window_size = (self._step_in_epoch + 1) % self._accumulation_steps
+        if not self.is_train or self._iter_per_epoch is not None or window_size == 0:
+            return
+
+        # gradients were divided by accumulation_steps instead of window_size
+        scale = self._accumulation_steps / window_size
+        is_ddp = isinstance(self.model, nn.parallel.DistributedDataParallel)
+        if is_ddp:
+            # gradients of the last window were computed in no_sync mode
+            scale /= distributed.get_world_size()
+        for param in self.model.parameters():
+            if param.grad is not None:
+                if is_ddp:
+                    distributed.all_reduce(param.grad)
+                param.grad.mul_(scale)
+        self._optimizer_step()
+        if self.scheduler is not None and not self.update_scheduler_by_epoch:
+            self.scheduler.step()
+
+    def _accumulation_window(self) -> Tuple[bool, bool, int]:
+        # returns whether this iteration is the first and the last of its accumulation window, and the window size.
+        # windows are reset every epoch, so that the last window of an epoch may be shorter
+        window_start = self._step_in_epoch - self._step_in_epoch % self._accumulation_steps
+        window_size = self._accumulation_steps
+        if self._iter_per_epoch is not None:
+            window_size = min(window_size, self._iter_per_epoch - window_start)
+        return (self._step_in_epoch == window_start,
+                self._step_in_epoch + 1 == window_start + window_size,
+                window_size)
+
+    def _gradient_sync(self,
+                       sync: bool):
+        if not sync and isinstance(self.model, nn.parallel.DistributedDataParallel):
+            # skip all-reduce of gradients except for the last step of accumulation
+            return self.model.no_sync()
+        return contextlib.nullcontext()
+
 
 class DistributedSupervisedTrainer(SupervisedTrainer):
     """ Trainer with distributed functions
@@ -390,6 +740,10 @@ class DistributedSupervisedTrainer(SupervisedTrainer):
 
             if not is_apex_available:
                 raise RuntimeError("apex not installed")
+            if kwargs.get("use_amp", False):
+                raise RuntimeError("enable_amp (apex) and use_amp (torch.cuda.amp) cannot be used together")
+        if kwargs.get("use_cuda_graphs", False):
+            raise RuntimeError(f"{type(self)} does not support CUDA graphs")
 
         import sys as python_sys
         from torch import distributed
@@ -397,7 +751,7 @@ class DistributedSupervisedTrainer(SupervisedTrainer):
         # should be used with torch.distributed.launch
         if not is_distributed:
             raise RuntimeError(
-                f"For distributed training, use python -m torch.distributed.launch "
+                f"For distributed training, use python -m torch.distributed.launch (or torchrun) "
                 f"--nproc_per_node={torch.cuda.device_count()} {' '.join(python_sys.argv)} ...")
 
         distributed.init_process_group(backend=backend, init_method=init_method)
@@ -421,25 +775,17 @@ class DistributedSupervisedTrainer(SupervisedTrainer):
             self.model, self.optimizer = amp.initialize(self.model, self.optimizer, opt_level="O2")
             self.model = DistributedDataParallel(self.model, delay_allreduce=True)
             self.loss_scaler = amp.scale_loss
+            # apex patches zero_grad, which does not accept set_to_none
+            self._set_grad_to_none = False
         else:
             self.model = nn.parallel.DistributedDataParallel(self.model, device_ids=[rank])
 
-    def iteration(self, data: Tuple[torch.Tensor]) -> Mapping[str, torch.Tensor]:
-        input, target = data
-        output = self.model(input)
-        loss = self.loss_f(output, target)
-        if self.is_train:
-            self.optimizer.zero_grad()
-            if self.loss_scaler is not None:
-                with self.loss_scaler(loss, self.optimizer) as scaled_loss:
-                    scaled_loss.backward()
-            else:
-                loss.backward()
-            self.optimizer.step()
-
-            if self.scheduler is not None and not self.update_scheduler_by_epoch:
-                self.scheduler.step()
-        return Map(loss=loss, output=output)
+    def _backward(self, loss: torch.Tensor):
+        if self.loss_scaler is not None:
+            with self.loss_scaler(loss, self.optimizer) as scaled_loss:
+                scaled_loss.backward()
+        else:
+            super(DistributedSupervisedTrainer, self)._backward(loss)
 
 
 # alias
@@ -14,8 +14,9 @@ class Map(MutableMapping, dict):
     """
 
     # inherit `dict` to avoid problem with `backward_hook`s
-    __default_methods = ["update", "keys", "items", "values", "clear",
-                         "copy", "get", "pop", "to", "deepcopy"] + __import__('keyword').kwlist
+    # frozenset, as membership is checked every time an item is get or set
+    __default_methods = frozenset(["update", "keys", "items", "values", "clear",
+                                   "copy", "get", "pop", "to", "deepcopy"] + __import__('keyword').kwlist)
     __slots__ = ["_data"]
 
     def __init__(self, **kwargs):
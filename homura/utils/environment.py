@@ -16,7 +16,9 @@ is_accimage_available = importlib.util.find_spec("accimage") is not None
 is_apex_available = importlib.util.find_spec("apex") is not None
 
 args = " ".join(python_sys.argv)
-is_distributed = "--local_rank" in args
+# "--local_rank" is given by torch.distributed.launch, and "LOCAL_RANK", "RANK" and "WORLD_SIZE" are set by torchrun
+_is_torchrun = all(k in python_os.environ for k in ("LOCAL_RANK", "RANK", "WORLD_SIZE"))
+is_distributed = "--local_rank" in args or _is_torchrun
 
 
 def _decode_bytes(b: bytes) -> str:
@@ -48,6 +50,8 @@ def get_local_rank() -> int:
     # it works before dist.init_process_group
     if not is_distributed:
         return -1
+    elif _is_torchrun:
+        return int(python_os.environ["LOCAL_RANK"])
     else:
         for arg in python_sys.argv:
             if "--local_rank" in arg:
@@ -0,0 +1,55 @@
+import torch
+from torch.utils.data import DataLoader
+
+from ._vocabulary import *
+from .containers import TensorTuple
+
+
+class DataPrefetcher(object):
+    """ prefetch data. While the current batch is processed on the current stream, the next batch is transferred to
+    the device on a side stream. Works best with `DataLoader(..., pin_memory=True)`.
+
+    :param loader: data loader
+    :param device: device where data are transferred. Default is "cuda".
+    """
+
+    def __init__(self, loader: DataLoader, device: torch.device or str = GPU):
+        self.loader = loader
+        self.device = device
+        self._cuda_available = torch.cuda.is_available() and GPU in str(device)
+        # streams should be on the target device, which may not be the current device
+        self.stream = torch.cuda.Stream(device=device) if self._cuda_available else None
+        self._iterator = None
+        self.next_data = None
+
+    def preload(self):
+        try:
+            self.next_data = TensorTuple(next(self._iterator))
+        except StopIteration:
+            self.next_data = None
+            return
+        if self._cuda_available:
+            with torch.cuda.stream(self.stream):
+                self.next_data = self.next_data.to(device=self.device, non_blocking=True)
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self._iterator = iter(self.loader)
+        self.preload()
+        return self
+
+    def __next__(self):
+        if self._cuda_available:
+            torch.cuda.current_stream(self.stream.device).wait_stream(self.stream)
+        data = self.next_data
+        if data is None:
+            raise StopIteration
+        if self._cuda_available:
+            # memory allocated on the side stream should not be reused until the current stream finishes using it
+            current_stream = torch.cuda.current_stream(self.stream.device)
+            for t in data:
+                t.record_stream(current_stream)
+        self.preload()
+        return data
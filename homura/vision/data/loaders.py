@@ -1,3 +1,4 @@
+import inspect
 from pathlib import Path
 from typing import Iterable, Union, Optional
 
@@ -7,6 +8,9 @@ from torchvision import datasets, transforms
 from .custom_dataset import transformable_random_split
 from .folder import ImageFolder
 
+# persistent_workers is available from PyTorch 1.7
+_PERSISTENT_WORKERS_AVAILABLE = "persistent_workers" in inspect.signature(DataLoader).parameters
+
 
 class BaseLoaders(object):
     """ A base class for simple data-loaders
@@ -88,15 +92,19 @@ class BaseLoaders(object):
                                      f"It works but may cause problem!")
             train_sampler = RandomSampler(train_set, replacement=True, num_samples=self._num_train_samples)
 
+        loader_kwargs = dict(num_workers=num_workers, pin_memory=True)
+        if num_workers > 0 and _PERSISTENT_WORKERS_AVAILABLE:
+            # keep worker processes alive across epochs instead of re-creating them at the beginning of every epoch
+            loader_kwargs["persistent_workers"] = True
+
         train = DataLoader(train_set, sampler=train_sampler,
-                           batch_size=batch_size, num_workers=num_workers, shuffle=shuffle, pin_memory=True)
+                           batch_size=batch_size, shuffle=shuffle, **loader_kwargs)
         test = DataLoader(test_set, sampler=test_sampler,
-                          batch_size=2 * batch_size, num_workers=num_workers, shuffle=False, pin_memory=True)
+                          batch_size=2 * batch_size, shuffle=False, **loader_kwargs)
         if val_size == 0:
             return train, test
 
-        val = DataLoader(val_set, sampler=val_sampler, batch_size=2 * batch_size, num_workers=num_workers,
-                         shuffle=False, pin_memory=True)
+        val = DataLoader(val_set, sampler=val_sampler, batch_size=2 * batch_size, shuffle=False, **loader_kwargs)
         return train, test, val
 
     @staticmethod
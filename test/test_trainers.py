@@ -1,8 +1,10 @@
+import pytest
 import torch
 from torch import nn
 from torch.nn import functional as F
+from torch.utils.data import DataLoader, DistributedSampler, TensorDataset
 
-from homura import optim, trainers, utils, lr_scheduler
+from homura import callbacks, optim, trainers, utils, lr_scheduler
 
 
 def test_dict_model():
@@ -45,3 +47,165 @@ def test_update_scheduler():
                              update_scheduler_by_epoch=True)
     trainer.train(loader)
     assert list(trainer.optimizer.param_groups)[0]['lr'] == 0.1 ** 3
+
+
+def test_accumulation_steps():
+    model = nn.Linear(10, 10)
+    optimizer = optim.SGD(lr=0.1)
+    trainer = trainers.SupervisedTrainer(model, optimizer, F.cross_entropy, accumulation_steps=2, verb=False)
+    # optimizer.step is counted by the scheduler
+    trainer.update_scheduler(lr_scheduler.LambdaLR(lambda step: 0.1 ** step),
+                             update_scheduler_by_epoch=False)
+    loader = [(torch.randn(2, 10), torch.zeros(2, dtype=torch.long)) for _ in range(3)]
+    weight = model.weight.clone()
+    trainer.train(loader[:1])
+    # the window of the first epoch is truncated at the end of the epoch
+    assert not torch.equal(weight, model.weight)
+
+    trainer.train(loader)
+    # 3 iterations are split into windows of 2 and 1 iterations, then parameters are updated 1 + 2 times in total
+    assert list(trainer.optimizer.param_groups)[0]['lr'] == pytest.approx(0.1 ** 4)
+
+    # the last window is flushed even if the length of data loader is unknown
+    trainer.train(iter(loader))
+    assert list(trainer.optimizer.param_groups)[0]['lr'] == pytest.approx(0.1 ** 6)
+
+
+def _is_module_scriptable():
+    # scripting nn.Module is supported from PyTorch 1.2
+    try:
+        torch.jit.script(nn.Linear(1, 1))
+    except Exception:
+        return False
+    return True
+
+
+@pytest.mark.skipif(not _is_module_scriptable(), reason="scripting nn.Module requires PyTorch>=1.2")
+def test_jit():
+    model = nn.Linear(10, 10)
+    optimizer = optim.SGD(lr=0.1)
+    trainer = trainers.SupervisedTrainer(model, optimizer, F.cross_entropy, jit="script", verb=False)
+    assert isinstance(trainer.model, torch.jit.ScriptModule)
+    loader = [(torch.randn(2, 10), torch.zeros(2, dtype=torch.long)) for _ in range(2)]
+    trainer.train(loader)
+    trainer.test(loader)
+
+
+def test_loader_without_len():
+    model = nn.Linear(10, 10)
+    optimizer = optim.SGD(lr=0.1)
+    trainer = trainers.SupervisedTrainer(model, optimizer, F.cross_entropy, verb=False)
+    loader = [(torch.randn(2, 10), torch.zeros(2, dtype=torch.long)) for _ in range(4)]
+    trainer.train(iter(loader))
+    assert trainer._epoch_map["iter_per_epoch"] == 4
+
+
+def test_submodel_streams():
+    # on CPU, submodel_context is a null context
+    class Trainer(trainers.TrainerBase):
+        def iteration(self, data):
+            input, target = data
+            with self.submodel_context("generator"):
+                gen_output = self.model["generator"](input)
+            with self.submodel_context("discriminator"):
+                dis_output = self.model["discriminator"](input)
+            self.synchronize_submodels()
+            output = gen_output + dis_output
+            loss = self.loss_f(output, target)
+            if self.is_train:
+                self.optimizer.zero_grad()
+                loss.backward()
+                self.optimizer.step()
+            return utils.Map(loss=loss, output=output)
+
+    model = {"generator": nn.Linear(10, 10),
+             "discriminator": nn.Linear(10, 10)}
+    optimizer = {"generator": optim.SGD(lr=0.1),
+                 "discriminator": optim.SGD(lr=0.1)}
+    trainer = Trainer(model, optimizer, F.cross_entropy, use_submodel_streams=True, verb=False)
+    loader = [(torch.randn(2, 10), torch.zeros(2, dtype=torch.long)) for _ in range(2)]
+    trainer.train(loader)
+    trainer.test(loader)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="CUDA is not available")
+def test_submodel_streams_cuda():
+    model = {"generator": nn.Linear(10, 10),
+             "discriminator": nn.Linear(10, 10)}
+    optimizer = {"generator": optim.SGD(lr=0.1),
+                 "discriminator": optim.SGD(lr=0.1)}
+    class Trainer(trainers.TrainerBase):
+        def iteration(self, data):
+            pass
+
+    trainer = Trainer(model, optimizer, F.cross_entropy, use_submodel_streams=True, device="cuda:0", verb=False)
+    default_stream = torch.cuda.current_stream()
+    for name in model.keys():
+        with trainer.submodel_context(name):
+            assert torch.cuda.current_stream() == trainer._submodel_streams[name]
+        assert torch.cuda.current_stream() == default_stream
+    trainer.synchronize_submodels()
+
+
+def test_amp_on_cpu():
+    model = nn.Linear(10, 10)
+    optimizer = optim.SGD(lr=0.1)
+    trainer = trainers.SupervisedTrainer(model, optimizer, F.cross_entropy, use_amp=True, device="cpu", verb=False)
+    # AMP is disabled on CPU
+    assert trainer._scaler is None
+    loader = [(torch.randn(2, 10), torch.zeros(2, dtype=torch.long)) for _ in range(2)]
+    trainer.train(loader)
+    trainer.test(loader)
+
+
+def test_distributed_sampler_epoch():
+    model = nn.Linear(10, 10)
+    optimizer = optim.SGD(lr=0.1)
+    trainer = trainers.SupervisedTrainer(model, optimizer, F.cross_entropy, verb=False)
+    dataset = TensorDataset(torch.randn(8, 10), torch.zeros(8, dtype=torch.long))
+    sampler = DistributedSampler(dataset, num_replicas=2, rank=0)
+    loader = DataLoader(dataset, batch_size=2, sampler=sampler)
+    for epoch in range(2):
+        trainer.train(loader)
+        assert sampler.epoch == epoch
+
+
+@pytest.mark.skipif(not hasattr(torch, "channels_last"), reason="channels_last requires PyTorch>=1.5")
+def test_channels_last():
+    model = nn.Sequential(nn.Conv2d(3, 4, 3), nn.AdaptiveAvgPool2d(1), nn.Flatten())
+    optimizer = optim.SGD(lr=0.1)
+    trainer = trainers.SupervisedTrainer(model, optimizer, F.cross_entropy, memory_format=torch.channels_last,
+                                         verb=False)
+    assert model[0].weight.is_contiguous(memory_format=torch.channels_last)
+
+    inputs = []
+    model.register_forward_pre_hook(lambda module, input: inputs.append(input[0]))
+    loader = [(torch.randn(2, 3, 8, 8), torch.zeros(2, dtype=torch.long))]
+    trainer.train(loader)
+    assert inputs[0].is_contiguous(memory_format=torch.channels_last)
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"data_parallel": True}, {"jit": "compile"}])
+def test_cuda_graphs_unsupported(kwargs):
+    model = nn.Linear(10, 10)
+    optimizer = optim.SGD(lr=0.1)
+    with pytest.raises(RuntimeError):
+        trainers.SupervisedTrainer(model, optimizer, F.cross_entropy, use_cuda_graphs=True, device="cpu",
+                                   verb=False, **kwargs)
+
+
+def test_callbacks_get_detached_tensors():
+    class RequiresGrad(callbacks.Callback):
+        def __init__(self):
+            self.requires_grad = []
+
+        def after_iteration(self, data):
+            self.requires_grad.append((data["loss"].requires_grad, data["output"].requires_grad))
+
+    model = nn.Linear(10, 10)
+    optimizer = optim.SGD(lr=0.1)
+    c = RequiresGrad()
+    trainer = trainers.SupervisedTrainer(model, optimizer, F.cross_entropy, callbacks=c, verb=False)
+    loader = [(torch.randn(2, 10), torch.zeros(2, dtype=torch.long)) for _ in range(2)]
+    trainer.train(loader)
+    assert c.requires_grad == [(False, False), (False, False)]
@@ -0,0 +1,35 @@
+import pytest
+import torch
+from torch.utils.data import TensorDataset, DataLoader
+
+from homura.utils.prefetcher import DataPrefetcher
+
+
+def test_prefetcher():
+    data = torch.randn(128, 3, 32, 32)
+    label = torch.arange(128)
+    dataset = TensorDataset(data, label)
+    loader = DataLoader(dataset, batch_size=32)
+    prefetcher = DataPrefetcher(loader)
+    assert len(prefetcher) == 4
+    for _ in range(2):
+        counter = 0
+        for input, target in prefetcher:
+            counter += 1
+        assert counter == 4
+
+
+def test_prefetcher_cpu():
+    loader = DataLoader(TensorDataset(torch.randn(8, 3)), batch_size=4)
+    prefetcher = DataPrefetcher(loader, device="cpu")
+    assert prefetcher.stream is None
+    assert all(input.device.type == "cpu" for input, in prefetcher)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="GPU is unavailable")
+def test_prefetcher_device():
+    device = torch.device("cuda", torch.cuda.device_count() - 1)
+    loader = DataLoader(TensorDataset(torch.randn(8, 3)), batch_size=4, pin_memory=True)
+    prefetcher = DataPrefetcher(loader, device=device)
+    assert prefetcher.stream.device == device
+    assert all(input.device == device for input, in prefetcher)